@@ -1,4 +1,5 @@
 import argparse
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 import json
 import os
@@ -10,16 +11,41 @@ from urllib.error import HTTPError
 import bs4
 import pandas as pd
 
-def search_box(search_key,  start_page, end_page):
+GOODREADS_URL = 'https://www.goodreads.com'
+BOOK_URL = GOODREADS_URL + '/book/show/'
+# SoupStrainer sees the raw class string while parsing, so match bookTitle as one of several classes.
+BOOK_TITLE_STRAINER = bs4.SoupStrainer('a', class_=re.compile(r'(^|\s)bookTitle(\s|$)'))
+BOOK_HREF_RE = re.compile(r'([^[/]+)\?')
+BOOK_ID_RE = re.compile(r'([^.-]+)')
+YEAR_RE = re.compile(r'([0-9]{3,4})')
+ISBN_RE = re.compile(r'nisbn: ([0-9]{10})')
+ISBN13_RE = re.compile(r'nisbn13: ([0-9]{13})')
+RATING_RE = re.compile(r'renderRatingGraph\(\s*\[([0-9,\s]+)')
+
+
+def to_int(s):
+    return int(s.strip().replace(',', ''))
+
+
+def get_search_page_books(url):
+    source = urlopen(url)
+    # Only the book title links are needed, so skip building the rest of the page.
+    soup = bs4.BeautifulSoup(source, 'lxml', parse_only=BOOK_TITLE_STRAINER)
+    return [BOOK_HREF_RE.search(line.get('href')).group(1) for line in soup.find_all('a', class_='bookTitle')]
+
+
+def search_box(search_key,  start_page, end_page, max_workers=1):
     key = search_key.replace(" ","+")
+    urls = [f'{GOODREADS_URL}/search?page={i}&q={key}' for i in range(start_page, end_page+1)]
     book_list = []
-    for i in range(start_page, end_page+1):
-        url = f'https://www.goodreads.com/search?page={i}&q={key}'
-        source = urlopen(url)
-        soup = bs4.BeautifulSoup(source, 'html.parser')
-        for line in soup.find_all('a', class_='bookTitle'):
-            a = re.findall("[^[/]+\?",line.get('href'))
-            book_list.append(a[0].replace("?",""))
+    if max_workers == 1:
+        for url in urls:
+            book_list += get_search_page_books(url)
+    else:
+        # map keeps the books in page order.
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for page_books in executor.map(get_search_page_books, urls):
+                book_list += page_books
     with open('book_list.txt', 'w') as f:
         for line in book_list:
             f.write(line)
@@ -31,32 +57,33 @@ def get_all_lists(soup):
     lists = []
     list_count_dict = {}
 
-    if soup.find('a', text='More lists with this book...'):
-
-        lists_url = soup.find('a', text='More lists with this book...')['href']
+    lists_link = soup.find('a', string='More lists with this book...')
+    if lists_link:
 
-        source = urlopen('https://www.goodreads.com' + lists_url)
+        source = urlopen(GOODREADS_URL + lists_link['href'])
         soup = bs4.BeautifulSoup(source, 'lxml')
-        lists += [' '.join(node.text.strip().split()) for node in soup.find_all('div', {'class': 'cell'})]
+        # Keep each cell as its list of words; that is all the formatting below needs.
+        lists += [node.text.split() for node in soup.find_all('div', {'class': 'cell'})]
 
         i = 0
-        while soup.find('a', {'class': 'next_page'}) and i <= 10:
+        next_page = soup.find('a', {'class': 'next_page'})
+        while next_page and i <= 10:
             time.sleep(2)
-            next_url = 'https://www.goodreads.com' + soup.find('a', {'class': 'next_page'})['href']
-            source = urlopen(next_url)
+            source = urlopen(GOODREADS_URL + next_page['href'])
             soup = bs4.BeautifulSoup(source, 'lxml')
 
-            lists += [node.text for node in soup.find_all('div', {'class': 'cell'})]
+            lists += [node.text.split() for node in soup.find_all('div', {'class': 'cell'})]
+            next_page = soup.find('a', {'class': 'next_page'})
             i += 1
 
         # Format lists text.
-        for _list in lists:
-            # _list_name = ' '.join(_list.split()[:-8])
-            # _list_rank = int(_list.split()[-8][:-2])
-            # _num_books_on_list = int(_list.split()[-5].replace(',', ''))
+        for _words in lists:
+            # _list_name = ' '.join(_words[:-8])
+            # _list_rank = int(_words[-8][:-2])
+            # _num_books_on_list = int(_words[-5].replace(',', ''))
             # list_count_dict[_list_name] = _list_rank / float(_num_books_on_list)     # TODO: switch this back to raw counts
-            _list_name = _list.split()[:-2][0]
-            _list_count = int(_list.split()[-2].replace(',', ''))
+            _list_name = _words[:-2][0]
+            _list_count = to_int(_words[-2])
             list_count_dict[_list_name] = _list_count
 
     return list_count_dict
@@ -65,19 +92,19 @@ def get_all_lists(soup):
 def get_shelves(soup):
     shelf_count_dict = {}
 
-    if soup.find('a', text='See top shelves…'):
+    shelves_link = soup.find('a', string='See top shelves…')
+    if shelves_link:
 
         # Find shelves text.
-        shelves_url = soup.find('a', text='See top shelves…')['href']
-        source = urlopen('https://www.goodreads.com' + shelves_url)
+        source = urlopen(GOODREADS_URL + shelves_link['href'])
         soup = bs4.BeautifulSoup(source, 'lxml')
-        shelves = [' '.join(node.text.strip().split()) for node in soup.find_all('div', {'class': 'shelfStat'})]
+        shelves = [node.text.split() for node in soup.find_all('div', {'class': 'shelfStat'})]
 
         # Format shelves text.
         shelf_count_dict = {}
-        for _shelf in shelves:
-            _shelf_name = _shelf.split()[:-2][0]
-            _shelf_count = int(_shelf.split()[-2].replace(',', ''))
+        for _words in shelves:
+            _shelf_name = _words[:-2][0]
+            _shelf_count = to_int(_words[-2])
             shelf_count_dict[_shelf_name] = _shelf_count
 
     return shelf_count_dict
@@ -113,31 +140,27 @@ def get_series_uri(soup):
 
 def get_top_5_other_editions(soup):
     other_editions = []
-    for div in soup.findAll('div', {'class': 'otherEdition'}):
+    for div in soup.find_all('div', {'class': 'otherEdition'}):
         other_editions.append(div.find('a')['href'])
     return other_editions
 
 
-def get_isbn(soup):
-    try:
-        isbn = re.findall(r'nisbn: [0-9]{10}', str(soup))[0].split()[1]
-        return isbn
-    except:
-        return "isbn not found"
+def get_isbn(page_source):
+    isbn = ISBN_RE.search(page_source)
+    if isbn:
+        return isbn.group(1)
+    return "isbn not found"
 
 
-def get_isbn13(soup):
-    try:
-        isbn13 = re.findall(r'nisbn13: [0-9]{13}', str(soup))[0].split()[1]
-        return isbn13
-    except:
-        return "isbn13 not found"
+def get_isbn13(page_source):
+    isbn13 = ISBN13_RE.search(page_source)
+    if isbn13:
+        return isbn13.group(1)
+    return "isbn13 not found"
 
 
-def get_rating_distribution(soup):
-    distribution = re.findall(r'renderRatingGraph\([\s]*\[[0-9,\s]+', str(soup))[0]
-    distribution = ' '.join(distribution.split())
-    distribution = [int(c.strip()) for c in distribution.split('[')[1].split(',')]
+def get_rating_distribution(page_source):
+    distribution = [int(c) for c in RATING_RE.search(page_source).group(1).split(',')]
     distribution_dict = {'5 Stars': distribution[0],
                          '4 Stars': distribution[1],
                          '3 Stars': distribution[2],
@@ -147,9 +170,10 @@ def get_rating_distribution(soup):
 
 
 def get_num_pages(soup):
-    if soup.find('span', {'itemprop': 'numberOfPages'}):
-        num_pages = soup.find('span', {'itemprop': 'numberOfPages'}).text.strip()
-        return int(num_pages.split()[0])
+    num_pages_node = soup.find('span', {'itemprop': 'numberOfPages'})
+    if num_pages_node:
+        num_pages = num_pages_node.text.strip()
+        return to_int(num_pages.split()[0])
     return ''
 
 
@@ -157,20 +181,21 @@ def get_year_first_published(soup):
     year_first_published = soup.find('nobr', attrs={'class': 'greyText'})
     if year_first_published:
         year_first_published = year_first_published.string
-        return re.search('([0-9]{3,4})', year_first_published).group(1)
+        return YEAR_RE.search(year_first_published).group(1)
     else:
         return ''
 
 
 def get_id(bookid):
-    pattern = re.compile("([^.-]+)")
-    return pattern.search(bookid).group()
+    return BOOK_ID_RE.search(bookid).group()
 
 
 def scrape_book(book_id):
-    url = 'https://www.goodreads.com/book/show/' + book_id
+    url = BOOK_URL + book_id
     source = urlopen(url)
-    soup = bs4.BeautifulSoup(source, 'html.parser')
+    soup = bs4.BeautifulSoup(source, 'lxml')
+    # Serialize the page once for the regex-based lookups below.
+    page_source = str(soup)
 
     time.sleep(2)
 
@@ -180,8 +205,8 @@ def scrape_book(book_id):
             "book_series": get_series_name(soup),
             "book_series_uri": get_series_uri(soup),
             'top_5_other_editions': get_top_5_other_editions(soup),
-            'isbn': get_isbn(soup),
-            'isbn13': get_isbn13(soup),
+            'isbn': get_isbn(page_source),
+            'isbn13': get_isbn13(page_source),
             'year_first_published': get_year_first_published(soup),
             'authorlink': soup.find('a', {'class': 'authorName'})['href'],
             'author': ' '.join(soup.find('span', {'itemprop': 'name'}).text.split()),
@@ -192,7 +217,22 @@ def scrape_book(book_id):
             'num_ratings': soup.find('meta', {'itemprop': 'ratingCount'})['content'].strip(),
             'num_reviews': soup.find('meta', {'itemprop': 'reviewCount'})['content'].strip(),
             'average_rating': soup.find('span', {'itemprop': 'ratingValue'}).text.strip(),
-            'rating_distribution': get_rating_distribution(soup)}
+            'rating_distribution': get_rating_distribution(page_source)}
+
+
+def scrape_and_save_book(book_id, output_directory_path):
+    book = scrape_book(book_id)
+    # Add book metadata to file name to be more specific
+    json.dump(book, open(output_directory_path + '/' + book_id + '_book-metadata.json', 'w'))
+
+
+def wait_for_books(futures, return_when=ALL_COMPLETED):
+    done, pending = wait(futures, return_when=return_when)
+    for future in done:
+        # Re-raise any HTTPError from the worker.
+        future.result()
+        print('=============================')
+    return pending
 
 
 def condense_books(books_directory_path):
@@ -221,9 +261,13 @@ def main():
     parser.add_argument('--format', type=str, action="store", default="json",
                         dest="format", choices=["json", "csv"],
                         help="set file output format")
+    parser.add_argument('--max_workers', type=int, default=1,
+                        help="number of search pages and books to scrape concurrently")
     args = parser.parse_args()
+    if args.max_workers < 1:
+        parser.error("\n\n--max_workers must be at least 1\n")
 
-    book_list = search_box(args.topic_search,args.start_page,args.end_page)
+    book_list = search_box(args.topic_search,args.start_page,args.end_page, max_workers=args.max_workers)
 
     books_already_scraped = [file_name.replace('_book-metadata.json', '') for file_name in
                              os.listdir(args.output_directory_path) if
@@ -231,17 +275,22 @@ def main():
     books_to_scrape = [book_id for book_id in book_list if book_id not in books_already_scraped]
     condensed_books_path = args.output_directory_path + '/all_books'
 
-    for i, book_id in enumerate(books_to_scrape):
+    # Each worker still sleeps after every book page, so --max_workers bounds the request rate.
+    # Books are submitted only when a worker is free, so nothing is queued behind an HTTPError.
+    with ThreadPoolExecutor(max_workers=args.max_workers) as executor:
+        in_flight = set()
         try:
-            print(str(datetime.now()) + ' ' + script_name + ': Scraping ' + book_id + '...')
-            print(str(datetime.now()) + ' ' + script_name + ': #' + str(
-                i + 1 + len(books_already_scraped)) + ' out of ' + str(len(book_list)) + ' books')
+            for i, book_id in enumerate(books_to_scrape):
+                if len(in_flight) == args.max_workers:
+                    in_flight = wait_for_books(in_flight, FIRST_COMPLETED)
+
+                print(str(datetime.now()) + ' ' + script_name + ': Scraping ' + book_id + '...')
+                print(str(datetime.now()) + ' ' + script_name + ': #' + str(
+                    i + 1 + len(books_already_scraped)) + ' out of ' + str(len(book_list)) + ' books')
 
-            book = scrape_book(book_id)
-            # Add book metadata to file name to be more specific
-            json.dump(book, open(args.output_directory_path + '/' + book_id + '_book-metadata.json', 'w'))
+                in_flight.add(executor.submit(scrape_and_save_book, book_id, args.output_directory_path))
 
-            print('=============================')
+            wait_for_books(in_flight)
 
         except HTTPError as e:
             print(e)
@@ -11,12 +11,12 @@ from selenium.webdriver.common.action_chains import ActionChains
 from selenium.common.exceptions import NoSuchElementException, ElementNotInteractableException, \
     ElementClickInterceptedException, ElementNotVisibleException, StaleElementReferenceException
 from selenium.webdriver.support.ui import Select
-from urllib.request import urlopen
 from urllib.error import HTTPError
 from selenium.webdriver.common.by import By
 import pandas as pd
 import geckodriver_autoinstaller
 from webdriver_manager.chrome import ChromeDriverManager
+from get_books import BOOK_URL, GOODREADS_URL, search_box
 
 RATING_STARS_DICT = {'it was amazing': 5,
                      'really liked it': 4,
@@ -24,22 +24,8 @@ RATING_STARS_DICT = {'it was amazing': 5,
                      'it was ok': 2,
                      'did not like it': 1,
                      '': None}
-
-def search_box(search_key,  start_page, end_page):
-    key = search_key.replace(" ","+")
-    book_list = []
-    for i in range(start_page, end_page+1):
-        url = f'https://www.goodreads.com/search?page={i}&q={key}'
-        source = urlopen(url)
-        soup = bs4.BeautifulSoup(source, 'html.parser')
-        for line in soup.find_all('a', class_='bookTitle'):
-            a = re.findall("[^[/]+\?",line.get('href'))
-            book_list.append(a[0].replace("?",""))
-    with open('book_list.txt', 'w') as f:
-        for line in book_list:
-            f.write(line)
-            f.write('\n')
-    return book_list
+BOOK_ID_RE = re.compile(r'([^.]+)')
+REVIEW_ID_RE = re.compile(r'[0-9]+')
 
 def switch_reviews_mode(driver, book_id, sort_order, rating=None):
     """
@@ -60,27 +46,30 @@ def switch_reviews_mode(driver, book_id, sort_order, rating=None):
 
 
 def get_rating(node):
-    if len(node.find_all('span', {'class': 'staticStars'})) > 0:
-        rating = node.find_all('span', {'class': 'staticStars'})[0]['title']
-        return RATING_STARS_DICT[rating]
+    stars_node = node.find('span', {'class': 'staticStars'})
+    if stars_node:
+        return RATING_STARS_DICT[stars_node['title']]
     return ''
 
 
 def get_user_name(node):
-    if len(node.find_all('a', {'class': 'user'})) > 0:
-        return node.find_all('a', {'class': 'user'})[0]['title']
+    user_node = node.find('a', {'class': 'user'})
+    if user_node:
+        return user_node['title']
     return ''
 
 
 def get_user_url(node):
-    if len(node.find_all('a', {'class': 'user'})) > 0:
-        return node.find_all('a', {'class': 'user'})[0]['href']
+    user_node = node.find('a', {'class': 'user'})
+    if user_node:
+        return user_node['href']
     return ''
 
 
 def get_date(node):
-    if len(node.find_all('a', {'class': 'reviewDate createdAt right'})) > 0:
-        return node.find_all('a', {'class': 'reviewDate createdAt right'})[0].text
+    date_node = node.find('a', {'class': 'reviewDate createdAt right'})
+    if date_node:
+        return date_node.text
     return ''
 
 
@@ -88,8 +77,9 @@ def get_text(node):
     display_text = ''
     full_text = ''
 
-    if len(node.find_all('span', {'class': 'readable'})) > 0:
-        for child in node.find_all('span', {'class': 'readable'})[0].children:
+    readable_node = node.find('span', {'class': 'readable'})
+    if readable_node:
+        for child in readable_node.children:
             if child.name == 'span' and 'style' not in child:
                 display_text = child.text
             if child.name == 'span' and 'style' in child and child['style'] == 'display:none':
@@ -102,8 +92,9 @@ def get_text(node):
 
 
 def get_num_likes(node):
-    if node.find('span', {'class': 'likesCount'}) and len(node.find('span', {'class': 'likesCount'})) > 0:
-        likes = node.find('span', {'class': 'likesCount'}).text
+    likes_node = node.find('span', {'class': 'likesCount'})
+    if likes_node and len(likes_node) > 0:
+        likes = likes_node.text
         if 'likes' in likes:
             return int(likes.split()[0])
     return 0
@@ -111,16 +102,15 @@ def get_num_likes(node):
 
 def get_shelves(node):
     shelves = []
-    if node.find('div', {'class': 'uitext greyText bookshelves'}):
-        _shelves_node = node.find('div', {'class': 'uitext greyText bookshelves'})
+    _shelves_node = node.find('div', {'class': 'uitext greyText bookshelves'})
+    if _shelves_node:
         for _shelf_node in _shelves_node.find_all('a'):
             shelves.append(_shelf_node.text)
     return shelves
 
 
 def get_id(bookid):
-    pattern = re.compile("([^.]+)")
-    return pattern.search(bookid).group()
+    return BOOK_ID_RE.search(bookid).group()
 
 
 def scrape_reviews_on_current_page(driver, url, book_id, sort_order):
@@ -134,11 +124,11 @@ def scrape_reviews_on_current_page(driver, url, book_id, sort_order):
 
     # Iterate through and parse the reviews.
     for node in nodes:
-        review_id = re.search('[0-9]+', node['id']).group(0)
+        review_id = REVIEW_ID_RE.search(node['id']).group(0)
         reviews.append({'book_id_title': book_id,
                         'book_id': get_id(book_id),
                         'book_title': book_title,
-                        'review_url': f"https://www.goodreads.com/review/show/{review_id}",
+                        'review_url': f"{GOODREADS_URL}/review/show/{review_id}",
                         'review_id': review_id,
                         'date': get_date(node),
                         'rating': get_rating(node),
@@ -160,7 +150,7 @@ def check_for_duplicates(reviews):
 
 def get_reviews_first_ten_pages(driver, book_id, sort_order, rating):
     reviews = []
-    url = 'https://www.goodreads.com/book/show/' + book_id
+    url = BOOK_URL + book_id
     driver.get(url)
 
     source = driver.page_source
@@ -240,8 +230,9 @@ def get_reviews_first_ten_pages(driver, book_id, sort_order, rating):
         reviews = get_reviews_first_ten_pages(driver, book_id, sort_order, rating)
         return reviews
 
-    if check_for_duplicates(reviews) >= 30:
-        print(f'ERROR: {check_for_duplicates(reviews)} duplicates found! Re-scraping this book.')
+    num_duplicates = check_for_duplicates(reviews)
+    if num_duplicates >= 30:
+        print(f'ERROR: {num_duplicates} duplicates found! Re-scraping this book.')
         reviews = get_reviews_first_ten_pages(driver, book_id, sort_order, rating)
         return reviews
     else:
@@ -276,15 +267,19 @@ def main():
     parser.add_argument('--format', type=str, action="store", default="json",
                         dest="format",
                         help="set file output format")
+    parser.add_argument('--max_workers', type=int, default=1,
+                        help="number of search pages to fetch concurrently")
 
     args = parser.parse_args()
+    if args.max_workers < 1:
+        parser.error("\n\n--max_workers must be at least 1\n")
     if not args.output_directory_path:
         parser.error(
             "\n\nPlease add the --output_directory_path and choose a directory filepath to output your reviews\n")
     if not args.browser:
         parser.error("\n\nPlease add the --browser flag and choose a browser: either Firefox or Chrome\n")
 
-    book_ids = search_box(args.topic_search,args.start_page,args.end_page)
+    book_ids = search_box(args.topic_search,args.start_page,args.end_page, max_workers=args.max_workers)
 
     books_already_scraped = [file_name.replace('_reviews.json', '') for file_name in
                              os.listdir(args.output_directory_path) if